@@ -2,66 +2,405 @@
 Módulo para enviar y obtener recursos FHIR desde un servidor HAPI FHIR.
 """
 
+import asyncio
+from collections import OrderedDict
+from collections.abc import Awaitable, Iterable, Mapping
+import logging
+import threading
+import time
+from typing import Any, TypeVar
+from urllib.parse import urlencode
+import weakref
+
+import httpx
+import ijson
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from fhir.resources.resource import Resource
+from fhir.resources.bundle import Bundle, BundleEntry, BundleEntryRequest
 from fhir.resources.patient import Patient
 from fhir.resources.coverage import Coverage
 
 
+# HTTPS permite negociar HTTP/2 (ALPN) en el cliente asíncrono
+BASE_URL = "https://hapi.fhir.org/baseR4"
+REQUEST_TIMEOUT = 10
+# Máximo de solicitudes simultáneas en las operaciones asíncronas en lote
+BULK_CONCURRENCY = 16
+
+_PATIENT_RESOURCE_TYPE = Patient.get_resource_type()
+_COVERAGE_RESOURCE_TYPE = Coverage.get_resource_type()
+
 RESOURCE_CLASSES = {
-    Patient.get_resource_type(): Patient,
-    Coverage.get_resource_type(): Coverage,
+    _PATIENT_RESOURCE_TYPE: Patient,
+    _COVERAGE_RESOURCE_TYPE: Coverage,
 }
 
+logger = logging.getLogger(__name__)
+
+
+# Sesión compartida para reutilizar las conexiones con el servidor HAPI FHIR
+SESSION = requests.Session()
+SESSION.headers.update({"Accept": "application/fhir+json",
+                        "Content-Type": "application/fhir+json"})
+# Un solo host: pool_connections alcanza; pool_maxsize acota las conexiones
+# simultáneas que pueden reutilizar los hilos que comparten la sesión
+_ADAPTER = HTTPAdapter(pool_connections=10,
+                       pool_maxsize=64,
+                       pool_block=False,
+                       max_retries=Retry(total=3,
+                                         backoff_factor=0.2,
+                                         status_forcelist=[429, 502, 503, 504],
+                                         raise_on_status=False))
+SESSION.mount("http://", _ADAPTER)
+SESSION.mount("https://", _ADAPTER)
+
+
+def close_session() -> None:
+    """
+    Cierra la sesión compartida y libera las conexiones abiertas.
+    """
+    SESSION.close()
+
+
+def _request(method: str,
+             path: str,
+             *,
+             params: Mapping[str, str] | None = None,
+             data: bytes | None = None,
+             headers: Mapping[str, str] | None = None,
+             stream: bool = False) -> requests.Response:
+    """
+    Realiza una solicitud al servidor HAPI FHIR usando la sesión compartida.
+    :param method: El método HTTP (ejemplo: 'GET', 'POST').
+    :param path: La ruta relativa a BASE_URL (ejemplo: '/Patient/123').
+    :param params: Parámetros de búsqueda, codificados por requests.
+    :param data: El cuerpo de la solicitud ya serializado.
+    :param headers: Encabezados adicionales a los de la sesión.
+    :param stream: Si es True, el cuerpo de la respuesta se lee a demanda.
+    :return: La respuesta del servidor.
+    """
+    return SESSION.request(method,
+                           f"{BASE_URL}{path}",
+                           params=params,
+                           data=data,
+                           headers=headers,
+                           stream=stream,
+                           timeout=REQUEST_TIMEOUT)
+
+
+def _log_error_response(message: str,
+                        response: requests.Response | httpx.Response) -> None:
+    """
+    Registra una respuesta de error del servidor. El cuerpo solo se parsea como JSON
+    cuando el nivel DEBUG está habilitado.
+    :param message: Descripción de la operación que falló.
+    :param response: La respuesta HTTP con el error.
+    """
+    logger.warning("%s: %s %s", message, response.status_code, response.text[:512])
+    if logger.isEnabledFor(logging.DEBUG):
+        try:
+            logger.debug("Detalle del error: %s", orjson.loads(response.content))
+        except ValueError:
+            pass
+
+
+# Caché en memoria de las lecturas (clave: URL final), con vencimiento por entrada
+_CACHE_MAXSIZE = 1024
+_CACHE_TTL = 300
+_CACHE: "OrderedDict[str, tuple[float, float, Any, str]]" = OrderedDict()
+_CACHE_LOCK = threading.Lock()
+
+
+class _CachedResponse:
+    """
+    Respuesta exitosa servida desde la caché, compatible con los helpers _parse_*.
+    """
+    status_code = 200
+
+    def __init__(self, body: Any) -> None:
+        self._body = body
+
+    def json(self) -> Any:
+        """
+        Devuelve el cuerpo JSON ya parseado.
+        """
+        return self._body
+
+
+def _cache_lifetimes(headers: Mapping[str, str]) -> tuple[float, float]:
+    """
+    Calcula la vigencia de una respuesta según sus encabezados Cache-Control y Age.
+    :param headers: Los encabezados de la respuesta.
+    :return: Tupla con (segundos de vigencia, segundos extra en los que puede servirse
+        vencida si el servidor falla).
+    """
+    ttl: float = _CACHE_TTL
+    # Solo se sirven respuestas vencidas si el servidor lo permite explícitamente
+    stale_if_error: float = 0
+    for directive in headers.get("Cache-Control", "").split(","):
+        name, _, value = directive.strip().partition("=")
+        name = name.lower()
+        if name == "no-store":
+            return 0, 0
+        if name == "no-cache":
+            # Se guarda igual para poder revalidarla con su ETag
+            ttl = 0
+        elif name == "max-age" and value.isdigit():
+            ttl = int(value)
+        elif name == "stale-if-error" and value.isdigit():
+            stale_if_error = int(value)
+    age = headers.get("Age", "")
+    if age.isdigit():
+        ttl = max(ttl - int(age), 0)
+    return ttl, stale_if_error
+
+
+def _cache_lookup(url: str, stale: bool = False) -> Any | None:
+    """
+    Busca el cuerpo de una respuesta en la caché.
+    :param url: La URL de la solicitud.
+    :param stale: Si es True, acepta entradas vencidas dentro de su ventana stale-if-error.
+    :return: El cuerpo JSON cacheado o None si no hay una entrada utilizable.
+    """
+    now = time.monotonic()
+    with _CACHE_LOCK:
+        entry = _CACHE.get(url)
+        if entry is None:
+            return None
+        expires_at, stale_until, body, etag = entry
+        if now >= stale_until:
+            # Con ETag se conserva para revalidarla; el LRU la desaloja si no se usa
+            if not etag:
+                del _CACHE[url]
+            return None
+        if now >= expires_at and not stale:
+            return None
+        _CACHE.move_to_end(url)
+        return body
+
+
+def _cache_store(url: str,
+                 headers: Mapping[str, str],
+                 body: Any,
+                 etag: str = "") -> None:
+    """
+    Guarda el cuerpo de una respuesta exitosa en la caché junto con su ETag.
+    :param url: La URL de la solicitud.
+    :param headers: Los encabezados de la respuesta.
+    :param body: El cuerpo JSON ya parseado.
+    :param etag: ETag a conservar si la respuesta no trae uno propio.
+    """
+    # Una búsqueda sin resultados no se guarda: el recurso puede crearse en cualquier
+    # momento y un "no encontrado" cacheado llevaría a duplicarlo
+    if (isinstance(body, dict) and body.get("resourceType") == "Bundle"
+            and body.get("type") == "searchset" and not body.get("entry")):
+        return
+    ttl, stale_if_error = _cache_lifetimes(headers)
+    etag = headers.get("ETag", etag)
+    if ttl <= 0 and stale_if_error <= 0 and not etag:
+        return
+    now = time.monotonic()
+    with _CACHE_LOCK:
+        _CACHE[url] = (now + ttl, now + ttl + stale_if_error, body, etag)
+        _CACHE.move_to_end(url)
+        while len(_CACHE) > _CACHE_MAXSIZE:
+            _CACHE.popitem(last=False)
+
+
+def _cache_validator(url: str) -> dict[str, str] | None:
+    """
+    Arma el encabezado If-None-Match a partir del ETag de la entrada cacheada, aunque
+    esté vencida, para que el servidor pueda responder 304 sin reenviar el cuerpo.
+    :param url: La URL de la solicitud.
+    :return: Los encabezados de la solicitud condicional o None si no hay ETag.
+    """
+    with _CACHE_LOCK:
+        entry = _CACHE.get(url)
+    if entry is None or not entry[3]:
+        return None
+    return {"If-None-Match": entry[3]}
+
+
+def _cache_revalidated(url: str, headers: Mapping[str, str]) -> Any | None:
+    """
+    Renueva la vigencia de una entrada tras una respuesta 304 Not Modified.
+    :param url: La URL de la solicitud.
+    :param headers: Los encabezados de la respuesta 304.
+    :return: El cuerpo cacheado o None si la entrada ya fue desalojada.
+    """
+    with _CACHE_LOCK:
+        entry = _CACHE.get(url)
+    if entry is None:
+        return None
+    _cache_store(url, headers, entry[2], entry[3])
+    return entry[2]
+
+
+def _cache_invalidate(resource_type: str) -> None:
+    """
+    Elimina de la caché las lecturas y búsquedas de un tipo de recurso.
+    :param resource_type: El tipo de recurso modificado (ejemplo: 'Patient').
+    """
+    prefixes = (f"{BASE_URL}/{resource_type}/", f"{BASE_URL}/{resource_type}?")
+    # También las búsquedas de otros tipos que incluyen este (ej. _revinclude=Coverage:beneficiary)
+    included = f"={resource_type}%3A"
+    with _CACHE_LOCK:
+        for url in [url for url in _CACHE if url.startswith(prefixes) or included in url]:
+            del _CACHE[url]
+
+
+def cache_clear() -> None:
+    """
+    Vacía la caché de lecturas.
+    """
+    with _CACHE_LOCK:
+        _CACHE.clear()
+
+
+def _cache_key(path: str, params: Mapping[str, str] | None) -> str:
+    """
+    Arma la URL canónica usada como clave de la caché.
+    :param path: La ruta relativa a BASE_URL.
+    :param params: Parámetros de búsqueda.
+    :return: La URL completa con los parámetros ordenados y codificados.
+    """
+    if not params:
+        return f"{BASE_URL}{path}"
+    return f"{BASE_URL}{path}?{urlencode(sorted(params.items()))}"
+
+
+def _cached_get(path: str,
+                params: Mapping[str, str] | None = None) -> requests.Response | _CachedResponse:
+    """
+    Realiza un GET pasando por la caché. Si la entrada venció pero tiene ETag, la
+    solicitud es condicional y un 304 reutiliza el cuerpo cacheado. Ante un error 5xx
+    sirve la última respuesta cacheada si sigue dentro de su ventana stale-if-error.
+    :param path: La ruta relativa a BASE_URL.
+    :param params: Parámetros de búsqueda.
+    :return: La respuesta cacheada o la respuesta del servidor.
+    """
+    url = _cache_key(path, params)
+    body = _cache_lookup(url)
+    if body is not None:
+        return _CachedResponse(body)
+    response = _request("GET", path, params=params, headers=_cache_validator(url))
+    if response.status_code == 304:
+        body = _cache_revalidated(url, response.headers)
+        if body is not None:
+            return _CachedResponse(body)
+        response = _request("GET", path, params=params)
+    if response.status_code == 200:
+        body = orjson.loads(response.content)
+        _cache_store(url, response.headers, body)
+        return _CachedResponse(body)
+    if response.status_code >= 500:
+        body = _cache_lookup(url, stale=True)
+        if body is not None:
+            return _CachedResponse(body)
+    return response
+
+
+# Recursos ya validados, identificados por (tipo, ID, versión), con desalojo LRU
+_VALIDATED_MAXSIZE = 4096
+_VALIDATED: "OrderedDict[tuple[str, str, str], Resource]" = OrderedDict()
+_VALIDATED_LOCK = threading.Lock()
+
+R = TypeVar("R", bound=Resource)
+
+
+def _validate_resource(resource_class: type[R], data: dict) -> R:
+    """
+    Valida un recurso FHIR reutilizando el modelo ya validado si la misma versión
+    del recurso fue recibida antes. Los recursos sin ID o sin versionId se validan
+    siempre, ya que no hay forma de saber si cambiaron.
+    :param resource_class: La clase del recurso a validar.
+    :param data: El recurso como diccionario.
+    :return: El recurso validado. Las instancias se comparten entre llamadas.
+    """
+    resource_id = data.get('id')
+    version_id = (data.get('meta') or {}).get('versionId')
+    if not resource_id or not version_id:
+        return resource_class.model_validate(data)
+    key = (data.get('resourceType', resource_class.get_resource_type()), resource_id, version_id)
+    with _VALIDATED_LOCK:
+        resource = _VALIDATED.get(key)
+        if resource is not None:
+            _VALIDATED.move_to_end(key)
+    if isinstance(resource, resource_class):
+        return resource
+    resource = resource_class.model_validate(data)
+    with _VALIDATED_LOCK:
+        _VALIDATED[key] = resource
+        while len(_VALIDATED) > _VALIDATED_MAXSIZE:
+            _VALIDATED.popitem(last=False)
+    return resource
+
+
+def _id_from_location(location: str) -> str | None:
+    """
+    Extrae el ID de un recurso de una URL de la forma .../{tipo}/{id}/_history/{versión}.
+    :param location: La URL devuelta por el servidor (encabezado Location o response.location).
+    :return: El ID del recurso o None si la URL no tiene esa forma.
+    """
+    parts = location.split("/")
+    if len(parts) >= 3 and parts[-2] == "_history":
+        return parts[-3]
+    return None
+
+
+# Pide al servidor que devuelva el recurso guardado, para no tener que volver a leerlo
+_RETURN_REPRESENTATION = {"Prefer": "return=representation"}
+
 
 # Enviar el recurso FHIR al servidor HAPI FHIR
-def send_resource_to_hapi_fhir(resource: Resource) -> str | None:
+def send_resource_to_hapi_fhir(resource: Resource) -> dict | None:
     """
     Envía un recurso FHIR al servidor HAPI FHIR.
     :param resource: Un recurso FHIR que hereda de Resource.
-    :return: El ID del recurso creado en el servidor HAPI FHIR o None si hubo un error.
+    :return: El recurso creado tal como lo devolvió el servidor (si la respuesta no trae
+        cuerpo, solo su 'id') o None si hubo un error.
     """
     resource_type = resource.get_resource_type()
-    url = f"http://hapi.fhir.org/baseR4/{resource_type}"
-    headers = {"Content-Type": "application/fhir+json"}
-    resource_json = resource.model_dump_json()
-    response = requests.post(url,
-                             headers=headers,
-                             data=resource_json,
-                             timeout=10)
+    resource_json = resource.model_dump_json().encode("utf-8")
+    response = _request("POST", f"/{resource_type}",
+                        data=resource_json,
+                        headers=_RETURN_REPRESENTATION)
     if response.status_code == 201:
         print("Recurso creado exitosamente")
-        # Devolver el ID del recurso creado
-        return response.json()['id']
+        _cache_invalidate(resource_type)
+        if response.content:
+            return orjson.loads(response.content)
+        # Sin cuerpo, el ID se toma del encabezado Location
+        return {"id": _id_from_location(response.headers.get("Location", ""))}
     else:
-        print(f"Error al crear el recurso: {response.status_code}")
-        print(response.json())
+        _log_error_response("Error al crear el recurso", response)
         return None
 
 
-def edit_resource_in_hapi_fhir(resource: Resource) -> bool:
+def edit_resource_in_hapi_fhir(resource: Resource) -> dict | None:
     """
     Edita un recurso FHIR existente en el servidor HAPI FHIR.
     :param resource: Un recurso FHIR que hereda de Resource con el ID del recurso a editar.
-    :return: True si el recurso fue editado exitosamente, False en caso contrario.
+    :return: El recurso editado tal como lo devolvió el servidor (solo con su ID si la
+        respuesta no trae cuerpo) o None si hubo un error.
     """
     resource_type = resource.get_resource_type()
     resource_id = resource.id
-    url = f"http://hapi.fhir.org/baseR4/{resource_type}/{resource_id}"
-    headers = {"Content-Type": "application/fhir+json"}
-    resource_json = resource.model_dump_json()
-    response = requests.put(url,
-                            headers=headers,
-                            data=resource_json,
-                            timeout=10)
-    if response.status_code == 200:
+    resource_json = resource.model_dump_json().encode("utf-8")
+    response = _request("PUT", f"/{resource_type}/{resource_id}",
+                        data=resource_json,
+                        headers=_RETURN_REPRESENTATION)
+    if response.status_code in (200, 201):
         print("Recurso editado exitosamente")
-        return True
+        _cache_invalidate(resource_type)
+        return orjson.loads(response.content) if response.content else {"id": resource_id}
     else:
-        print(f"Error al editar el recurso: {response.status_code}")
-        print(response.json())
-        return False
+        _log_error_response("Error al editar el recurso", response)
+        return None
 
 
 # Buscar el recurso por ID
@@ -73,10 +412,16 @@ def get_resource_from_hapi_fhir(resource_id: str,
     :param resource_type: El tipo de recurso (ejemplo: 'Patient', 'Observation').
     :return: True si el recurso fue encontrado y obtenido exitosamente, False en caso contrario.
     """
-    url = f"http://hapi.fhir.org/baseR4/{resource_type}/{resource_id}"
-    response = requests.get(url,
-                            headers={"Accept": "application/fhir+json"},
-                            timeout=10)
+    response = _cached_get(f"/{resource_type}/{resource_id}")
+    return _parse_resource_read(response)
+
+
+def _parse_resource_read(response: requests.Response | httpx.Response | _CachedResponse) -> dict:
+    """
+    Convierte la respuesta de una lectura por ID en el diccionario del recurso.
+    :param response: La respuesta HTTP de la lectura.
+    :return: El recurso como diccionario o un diccionario vacío si no se encontró.
+    """
     # Verificar si la solicitud fue exitosa
     if response.status_code == 200:
         resource = response.json()
@@ -93,62 +438,139 @@ def get_resource_by_identifier(identifier: str,
     :param resource_type: El tipo de recurso (ejemplo: 'Patient', 'Observation').
     :return: Lista de recursos encontrados.
     """
-    resource_class = RESOURCE_CLASSES.get(resource_type, None)
-    if not resource_class:
-        print(f"Tipo de recurso no soportado: {resource_type}")
+    resource_class = RESOURCE_CLASSES.get(resource_type)
+    if resource_class is None:
+        logger.warning("Tipo de recurso no soportado: %s", resource_type)
         return []
-    url = f"http://hapi.fhir.org/baseR4/{resource_type}?identifier={identifier}"
-    response = requests.get(url,
-                            headers={"Accept": "application/fhir+json"},
-                            timeout=10)
+    response = _cached_get(f"/{resource_type}", {"identifier": identifier})
+    return _parse_identifier_search(response, resource_class)
+
+
+def _parse_identifier_search(response: requests.Response | httpx.Response | _CachedResponse,
+                             resource_class: type[Resource]) -> list[Resource]:
+    """
+    Convierte la respuesta de una búsqueda por identificador en una lista de recursos.
+    :param response: La respuesta HTTP de la búsqueda.
+    :param resource_class: La clase del recurso buscado.
+    :return: Lista de recursos encontrados.
+    """
     if response.status_code == 200:
-        resources = response.json().get('entry', [])
+        resources = response.json().get('entry') or ()
         if resources:
-            return [resource_class.model_validate(entry['resource']) for entry in resources]
+            return [_validate_resource(resource_class, entry['resource']) for entry in resources]
         else:
             print("No se encontraron recursos con ese identificador.")
             return []
     else:
-        print(f"Error al buscar el recurso: {response.status_code}")
-        print(response.json())
+        _log_error_response("Error al buscar el recurso", response)
         return []
 
 
 def get_coverage_by_beneficiary(beneficiary_resource_type: str,
-                                beneficiary_resource_id: str) -> list[Coverage]:
+                                beneficiary_resource_id: str,
+                                trusted: bool = False) -> list[Coverage]:
     """
     Busca recursos Coverage por el beneficiario en el servidor HAPI FHIR.
     :param beneficiary_resource_type: El tipo de recurso del beneficiario (ejemplo: 'Patient').
     :param beneficiary_resource_id: El ID del recurso del beneficiario.
+    :param trusted: Si es True, los recursos se construyen sin validar (model_construct).
+        Es mucho más rápido, pero los elementos anidados quedan como diccionarios.
+    :return: Lista de recursos Coverage encontrados.
+    """
+    params = _coverage_search_params(beneficiary_resource_type, beneficiary_resource_id)
+    # Se procesa el Bundle a medida que llega, validando y liberando cada entrada
+    with _request("GET", "/Coverage", params=params, stream=True) as response:
+        if response.status_code != 200:
+            return _parse_coverage_search(response, trusted)
+        response.raw.decode_content = True
+        return _coverages_from_entries(ijson.items(response.raw, 'entry.item', use_float=True),
+                                       trusted)
+
+
+def _coverage_search_params(beneficiary_resource_type: str,
+                            beneficiary_resource_id: str) -> dict[str, str]:
+    """
+    Arma los parámetros de la búsqueda de Coverage por beneficiario.
+    :param beneficiary_resource_type: El tipo de recurso del beneficiario (ejemplo: 'Patient').
+    :param beneficiary_resource_id: El ID del recurso del beneficiario.
+    :return: Los parámetros de búsqueda.
+    """
+    return {"beneficiary": f"{beneficiary_resource_type}/{beneficiary_resource_id}",
+            "_summary": "false",
+            "_elements": "*"}
+
+
+def _parse_coverage_search(response: requests.Response | httpx.Response,
+                           trusted: bool = False) -> list[Coverage]:
+    """
+    Convierte la respuesta de una búsqueda de Coverage en una lista de recursos Coverage.
+    :param response: La respuesta HTTP de la búsqueda.
+    :param trusted: Si es True, los recursos se construyen sin validar.
     :return: Lista de recursos Coverage encontrados.
     """
-    url = f"http://hapi.fhir.org/baseR4/Coverage?beneficiary={beneficiary_resource_type}/{beneficiary_resource_id}&_summary=false&_elements=*"
-    response = requests.get(url,
-                            headers={"Accept": "application/fhir+json"},
-                            timeout=10)
     if response.status_code == 200:
-        resources = response.json().get('entry', [])
-        if resources:
-            resources_list = []
-            for entry in resources:
-                try:
-                    resource = entry['resource']
-                    if "kind" not in resource:
-                        resource['kind'] = 'insurance'
-                    coverage = Coverage.model_validate(entry['resource'])
-                    resources_list.append(coverage)
-                except Exception as e:
-                    continue
-            return resources_list
-        else:
-            print("No se encontraron recursos Coverage para el beneficiario.")
-            return []
+        return _coverages_from_entries(orjson.loads(response.content).get('entry') or (),
+                                       trusted)
     else:
-        print(f"Error al buscar los recursos Coverage: {response.status_code}")
-        print(response.json())
+        _log_error_response("Error al buscar los recursos Coverage", response)
         return []
 
 
+def _coverages_from_entries(entries: Iterable[dict],
+                            trusted: bool = False) -> list[Coverage]:
+    """
+    Valida las entradas de un Bundle de búsqueda de Coverage, descartando las inválidas.
+    :param entries: Las entradas del Bundle (puede ser un iterador que las lee del socket).
+    :param trusted: Si es True, los recursos se construyen sin validar.
+    :return: Lista de recursos Coverage encontrados.
+    """
+    resources_list = []
+    found = False
+    for entry in entries:
+        found = True
+        try:
+            resource = entry['resource']
+            if "kind" not in resource:
+                resource['kind'] = 'insurance'
+            if trusted:
+                coverage = Coverage.model_construct(**resource)
+            else:
+                coverage = _validate_resource(Coverage, resource)
+            resources_list.append(coverage)
+        except Exception as e:
+            continue
+    if not found:
+        print("No se encontraron recursos Coverage para el beneficiario.")
+    return resources_list
+
+
+def get_patient_with_coverages(identifier: str) -> tuple[list[Patient], list[Coverage]]:
+    """
+    Busca los pacientes con el identificador dado junto con sus coberturas en una sola
+    solicitud (_revinclude=Coverage:beneficiary).
+    :param identifier: El identificador del paciente (ejemplo: su DNI).
+    :return: Tupla con (pacientes encontrados, coberturas de esos pacientes).
+    """
+    response = _cached_get(f"/{_PATIENT_RESOURCE_TYPE}",
+                           {"identifier": identifier,
+                            "_revinclude": "Coverage:beneficiary"})
+    if response.status_code != 200:
+        _log_error_response("Error al buscar el paciente y sus coberturas", response)
+        return [], []
+    patients = []
+    coverage_entries = []
+    for entry in response.json().get('entry') or ():
+        resource = entry['resource']
+        if resource.get('resourceType') == _PATIENT_RESOURCE_TYPE:
+            patients.append(_validate_resource(Patient, resource))
+        elif resource.get('resourceType') == _COVERAGE_RESOURCE_TYPE:
+            coverage_entries.append(entry)
+    if not patients:
+        print("No se encontraron recursos con ese identificador.")
+        return [], []
+    return patients, _coverages_from_entries(coverage_entries)
+
+
 def delete_resource_from_hapi_fhir(resource_id: str,
                                   resource_type: str) -> bool:
     """
@@ -157,12 +579,280 @@ def delete_resource_from_hapi_fhir(resource_id: str,
     :param resource_type: El tipo de recurso (ejemplo: 'Patient', 'Observation').
     :return: True si el recurso fue eliminado exitosamente, False en caso contrario.
     """
-    url = f"http://hapi.fhir.org/baseR4/{resource_type}/{resource_id}"
-    response = requests.delete(url, timeout=10)
+    response = _request("DELETE", f"/{resource_type}/{resource_id}")
     if response.status_code == 200:
         print("Recurso eliminado exitosamente")
+        _cache_invalidate(resource_type)
         return True
     else:
-        print(f"Error al eliminar el recurso: {response.status_code}")
-        print(response.json())
+        _log_error_response("Error al eliminar el recurso", response)
         return False
+
+
+def post_batch_bundle(entries: list[BundleEntry],
+                      bundle_type: str = "batch") -> list[dict]:
+    """
+    Envía varias operaciones en un único Bundle al servidor HAPI FHIR.
+    Cada entrada debe tener su `request` (método y URL relativa, por ejemplo
+    'Coverage?beneficiary=Patient/123') y, si corresponde, su `resource`.
+    :param entries: Las entradas del Bundle a enviar.
+    :param bundle_type: El tipo de Bundle ('batch' o 'transaction').
+    :return: Las entradas de la respuesta, en el mismo orden que las enviadas,
+        o una lista vacía si hubo un error.
+    """
+    bundle = Bundle(type=bundle_type, entry=entries)
+    response = _request("POST", "", data=bundle.model_dump_json().encode("utf-8"))
+    if response.status_code == 200:
+        if any(entry.request.method != "GET" for entry in entries if entry.request):
+            cache_clear()
+        return orjson.loads(response.content).get('entry', [])
+    else:
+        _log_error_response("Error al enviar el Bundle", response)
+        return []
+
+
+def transaction_entry(resource: Resource,
+                      full_url: str | None = None) -> BundleEntry:
+    """
+    Arma la entrada de un Bundle de transacción para guardar un recurso: PUT si el
+    recurso ya tiene ID, POST si es nuevo.
+    :param resource: El recurso FHIR a guardar.
+    :param full_url: URL temporal (por ejemplo 'urn:uuid:...') con la que otros recursos
+        de la misma transacción pueden referenciar a este.
+    :return: La entrada del Bundle.
+    """
+    resource_type = resource.get_resource_type()
+    if resource.id:
+        request = BundleEntryRequest(method="PUT", url=f"{resource_type}/{resource.id}")
+    else:
+        request = BundleEntryRequest(method="POST", url=resource_type)
+    return BundleEntry(fullUrl=full_url, resource=resource, request=request)
+
+
+def send_bundle_to_hapi_fhir(entries: list[BundleEntry],
+                             bundle_type: str = "transaction") -> list[str | None]:
+    """
+    Guarda varios recursos en una sola solicitud. En una transacción el servidor resuelve
+    las referencias 'urn:uuid:...' entre las entradas y aplica todo o nada.
+    :param entries: Las entradas a enviar (ver transaction_entry).
+    :param bundle_type: El tipo de Bundle ('transaction' o 'batch').
+    :return: El ID asignado a cada recurso, en el mismo orden que las entradas,
+        o una lista vacía si hubo un error.
+    """
+    response_entries = post_batch_bundle(entries, bundle_type)
+    return [_id_from_location((entry.get('response') or {}).get('location', ''))
+            for entry in response_entries]
+
+
+# Variantes asíncronas para consultas en lote. Los llamadores que necesiten muchas
+# búsquedas deben usar estas funciones dentro de un mismo event loop en lugar de
+# invocar las versiones síncronas una por una.
+_ASYNC_CLIENTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = \
+    weakref.WeakKeyDictionary()
+
+T = TypeVar("T")
+
+
+def _get_async_client() -> httpx.AsyncClient:
+    """
+    Devuelve el cliente asíncrono del event loop en ejecución, creándolo si no existe.
+    httpx no puede reutilizar conexiones entre distintos event loops, por eso se
+    mantiene un cliente por loop. El cliente usa HTTP/2, de modo que las consultas
+    concurrentes se multiplexan sobre una sola conexión.
+    :return: El cliente asíncrono compartido por el event loop actual.
+    """
+    loop = asyncio.get_running_loop()
+    client = _ASYNC_CLIENTS.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(base_url=BASE_URL,
+                                   http2=True,
+                                   headers={"Accept": "application/fhir+json",
+                                            "Content-Type": "application/fhir+json"},
+                                   limits=httpx.Limits(max_connections=32,
+                                                       max_keepalive_connections=32),
+                                   timeout=REQUEST_TIMEOUT)
+        _ASYNC_CLIENTS[loop] = client
+    return client
+
+
+async def aclose_async_client() -> None:
+    """
+    Cierra el cliente asíncrono del event loop en ejecución, si existe.
+    """
+    client = _ASYNC_CLIENTS.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def run_async(coroutine: Awaitable[T]) -> T:
+    """
+    Ejecuta una corrutina de este módulo desde código síncrono y cierra el cliente al terminar.
+    Conviene agrupar todas las consultas en una sola corrutina (por ejemplo con
+    get_many_coverages) en lugar de llamar a esta función una vez por consulta.
+    :param coroutine: La corrutina a ejecutar.
+    :return: El resultado de la corrutina.
+    """
+    async def runner() -> T:
+        try:
+            return await coroutine
+        finally:
+            await aclose_async_client()
+    return asyncio.run(runner())
+
+
+async def _acached_get(path: str,
+                       params: Mapping[str, str] | None = None) -> httpx.Response | _CachedResponse:
+    """
+    Versión asíncrona de _cached_get; comparte la caché con las funciones síncronas.
+    :param path: La ruta relativa a BASE_URL.
+    :param params: Parámetros de búsqueda.
+    :return: La respuesta cacheada o la respuesta del servidor.
+    """
+    url = _cache_key(path, params)
+    body = _cache_lookup(url)
+    if body is not None:
+        return _CachedResponse(body)
+    client = _get_async_client()
+    response = await client.get(path, params=params, headers=_cache_validator(url))
+    if response.status_code == 304:
+        body = _cache_revalidated(url, response.headers)
+        if body is not None:
+            return _CachedResponse(body)
+        response = await client.get(path, params=params)
+    if response.status_code == 200:
+        body = orjson.loads(response.content)
+        _cache_store(url, response.headers, body)
+        return _CachedResponse(body)
+    if response.status_code >= 500:
+        body = _cache_lookup(url, stale=True)
+        if body is not None:
+            return _CachedResponse(body)
+    return response
+
+
+async def aget_resource_from_hapi_fhir(resource_id: str,
+                                       resource_type: str) -> dict:
+    """
+    Versión asíncrona de get_resource_from_hapi_fhir.
+    :param resource_id: El ID del recurso a buscar.
+    :param resource_type: El tipo de recurso (ejemplo: 'Patient', 'Observation').
+    :return: El recurso como diccionario o un diccionario vacío si no se encontró.
+    """
+    response = await _acached_get(f"/{resource_type}/{resource_id}")
+    return _parse_resource_read(response)
+
+
+async def aget_resource_by_identifier(identifier: str,
+                                      resource_type: str) -> list[Resource]:
+    """
+    Versión asíncrona de get_resource_by_identifier.
+    :param identifier: El identificador del recurso a buscar.
+    :param resource_type: El tipo de recurso (ejemplo: 'Patient', 'Observation').
+    :return: Lista de recursos encontrados.
+    """
+    resource_class = RESOURCE_CLASSES.get(resource_type)
+    if resource_class is None:
+        logger.warning("Tipo de recurso no soportado: %s", resource_type)
+        return []
+    response = await _acached_get(f"/{resource_type}", {"identifier": identifier})
+    return _parse_identifier_search(response, resource_class)
+
+
+async def aget_coverage_by_beneficiary(beneficiary_resource_type: str,
+                                       beneficiary_resource_id: str,
+                                       trusted: bool = False) -> list[Coverage]:
+    """
+    Versión asíncrona de get_coverage_by_beneficiary.
+    :param beneficiary_resource_type: El tipo de recurso del beneficiario (ejemplo: 'Patient').
+    :param beneficiary_resource_id: El ID del recurso del beneficiario.
+    :param trusted: Si es True, los recursos se construyen sin validar.
+    :return: Lista de recursos Coverage encontrados.
+    """
+    params = _coverage_search_params(beneficiary_resource_type, beneficiary_resource_id)
+    response = await _get_async_client().get("/Coverage", params=params)
+    return _parse_coverage_search(response, trusted)
+
+
+async def get_many_coverages(pairs: Iterable[tuple[str, str]],
+                             trusted: bool = False) -> list[list[Coverage]]:
+    """
+    Busca en paralelo los recursos Coverage de varios beneficiarios.
+    :param pairs: Pares (tipo de recurso, ID) de cada beneficiario.
+    :param trusted: Si es True, los recursos se construyen sin validar.
+    :return: Una lista de coberturas por cada beneficiario, en el mismo orden.
+    """
+    return await asyncio.gather(*[aget_coverage_by_beneficiary(resource_type, resource_id, trusted)
+                                  for resource_type, resource_id in pairs])
+
+
+async def aedit_resource_in_hapi_fhir(resource: Resource) -> bool:
+    """
+    Versión asíncrona de edit_resource_in_hapi_fhir.
+    :param resource: Un recurso FHIR que hereda de Resource con el ID del recurso a editar.
+    :return: True si el recurso fue editado exitosamente, False en caso contrario.
+    """
+    resource_type = resource.get_resource_type()
+    response = await _get_async_client().put(f"/{resource_type}/{resource.id}",
+                                             content=resource.model_dump_json().encode("utf-8"))
+    if response.status_code in (200, 201):
+        _cache_invalidate(resource_type)
+        return True
+    else:
+        _log_error_response("Error al editar el recurso", response)
+        return False
+
+
+async def adelete_resource_from_hapi_fhir(resource_id: str,
+                                          resource_type: str) -> bool:
+    """
+    Versión asíncrona de delete_resource_from_hapi_fhir.
+    :param resource_id: El ID del recurso a eliminar.
+    :param resource_type: El tipo de recurso (ejemplo: 'Patient', 'Observation').
+    :return: True si el recurso fue eliminado exitosamente, False en caso contrario.
+    """
+    response = await _get_async_client().delete(f"/{resource_type}/{resource_id}")
+    if response.status_code == 200:
+        _cache_invalidate(resource_type)
+        return True
+    else:
+        _log_error_response("Error al eliminar el recurso", response)
+        return False
+
+
+async def _bounded(semaphore: asyncio.Semaphore, coroutine: Awaitable[T]) -> T:
+    """
+    Espera una corrutina respetando el límite de concurrencia del semáforo.
+    :param semaphore: El semáforo que limita las solicitudes simultáneas.
+    :param coroutine: La corrutina a ejecutar.
+    :return: El resultado de la corrutina.
+    """
+    async with semaphore:
+        return await coroutine
+
+
+async def edit_many_resources(resources: Iterable[Resource],
+                              concurrency: int = BULK_CONCURRENCY) -> list[bool | BaseException]:
+    """
+    Edita en paralelo varios recursos FHIR, con a lo sumo `concurrency` solicitudes en curso.
+    :param resources: Los recursos a editar, cada uno con su ID.
+    :param concurrency: Máximo de solicitudes simultáneas.
+    :return: El resultado de cada edición (o la excepción que la interrumpió), en el mismo orden.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    return await asyncio.gather(*[_bounded(semaphore, aedit_resource_in_hapi_fhir(resource))
+                                  for resource in resources],
+                                return_exceptions=True)
+
+
+async def delete_many_resources(pairs: Iterable[tuple[str, str]],
+                                concurrency: int = BULK_CONCURRENCY) -> list[bool | BaseException]:
+    """
+    Elimina en paralelo varios recursos FHIR, con a lo sumo `concurrency` solicitudes en curso.
+    :param pairs: Pares (ID, tipo de recurso) de los recursos a eliminar.
+    :param concurrency: Máximo de solicitudes simultáneas.
+    :return: El resultado de cada eliminación (o la excepción que la interrumpió), en el mismo orden.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    return await asyncio.gather(*[_bounded(semaphore, adelete_resource_from_hapi_fhir(resource_id, resource_type))
+                                  for resource_id, resource_type in pairs],
+                                return_exceptions=True)
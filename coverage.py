@@ -3,6 +3,7 @@ Módulo para crear un recurso FHIR Coverage.
 """
 
 
+from functools import lru_cache
 from typing import Optional
 
 from fhir.resources.coverage import Coverage
@@ -13,10 +14,28 @@ from fhir.resources.coding import Coding
 from fhir.resources.period import Period
 
 
+@lru_cache(maxsize=256)
+def _type_concept(coverage_type: str,
+                  coverage_type_display: Optional[str]) -> CodeableConcept:
+    """
+    Crea (una sola vez por combinación) el CodeableConcept del tipo de cobertura.
+    La instancia se comparte entre todos los Coverage creados, por lo que no debe modificarse.
+    :param coverage_type: Código del tipo de cobertura (ejemplo: 'EHCPOL').
+    :param coverage_type_display: Descripción del tipo de cobertura.
+    :return: El CodeableConcept ya validado.
+    """
+    coding = Coding()
+    coding.system = "http://terminology.hl7.org/CodeSystem/v3-ActCode"
+    coding.code = coverage_type
+    if coverage_type_display:
+        coding.display = coverage_type_display
+    return CodeableConcept(coding=[coding])
+
+
 def create_coverage_resource(
     coverage_type: str,
-    beneficiary_resource_type: str,
-    beneficiary_resource_id: str,
+    beneficiary_resource_type: Optional[str] = None,
+    beneficiary_resource_id: Optional[str] = None,
     status: str = "active",
     kind: str = "insurance",
     policy_identifier: Optional[str] = None,
@@ -24,6 +43,7 @@ def create_coverage_resource(
     subscriber_id: Optional[str] = None,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
+    beneficiary_reference: Optional[str] = None,
 ) -> Coverage:
     """
     Crea un recurso FHIR Coverage con los parámetros proporcionados.
@@ -37,17 +57,18 @@ def create_coverage_resource(
     :param subscriber_id: ID del suscriptor de la póliza.
     :param start_date: Fecha de inicio de la cobertura (formato ISO 8601).
     :param end_date: Fecha de finalización de la cobertura (formato ISO 8601).
+    :param beneficiary_reference: Referencia completa al beneficiario (ejemplo:
+        'urn:uuid:...' dentro de una transacción). Si se indica, reemplaza a
+        beneficiary_resource_type y beneficiary_resource_id.
     :return: Un recurso FHIR de tipo Coverage.
     """
-    type_concept = CodeableConcept()
-    coding = Coding()
-    coding.system = "http://terminology.hl7.org/CodeSystem/v3-ActCode"
-    coding.code = coverage_type
-    if coverage_type_display:
-        coding.display = coverage_type_display
-    type_concept.coding = [coding]
+    type_concept = _type_concept(coverage_type, coverage_type_display)
     beneficiary_ref = Reference()
-    beneficiary_ref.reference = f"{beneficiary_resource_type}/{beneficiary_resource_id}"
+    if beneficiary_reference is None:
+        if not (beneficiary_resource_type and beneficiary_resource_id):
+            raise ValueError("Falta el beneficiario de la cobertura")
+        beneficiary_reference = f"{beneficiary_resource_type}/{beneficiary_resource_id}"
+    beneficiary_ref.reference = beneficiary_reference
     coverage = Coverage(
         status=status,
         kind=kind,
@@ -56,9 +77,8 @@ def create_coverage_resource(
         )
     # Agregar identificador de póliza si está disponible
     if policy_identifier:
-        identifier = Identifier()
-        identifier.system = "http://example.org/policy-numbers"
-        identifier.value = policy_identifier
+        identifier = Identifier(system="http://example.org/policy-numbers",
+                                value=policy_identifier)
         coverage.identifier = [identifier]
     # Agregar ID del suscriptor si está disponible
     if subscriber_id:
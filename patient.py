@@ -31,6 +31,7 @@ def create_patient_resource(family_name: str| None = None,
             name.family = family_name
         if given_name:
             name.given = [given_name]
+        patient.name = [name]
     # Agregar la fecha de nacimiento si está disponible
     if birth_date:
         patient.birthDate = birth_date
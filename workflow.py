@@ -3,8 +3,15 @@ Módulo para gestionar el flujo de trabajo de creación y obtención de recursos
 """
 
 
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-import re
+import logging
+import sys
+import uuid
+
+import orjson
+import requests
 
 from fhir.resources.patient import Patient
 from fhir.resources.coverage import Coverage
@@ -15,19 +22,172 @@ from base import (send_resource_to_hapi_fhir,
                   get_resource_from_hapi_fhir,
                   get_resource_by_identifier,
                   edit_resource_in_hapi_fhir,
-                  get_coverage_by_beneficiary,
-                  delete_resource_from_hapi_fhir)
+                  get_patient_with_coverages,
+                  delete_resource_from_hapi_fhir,
+                  send_bundle_to_hapi_fhir,
+                  transaction_entry,
+                  close_session,
+                  BULK_CONCURRENCY)
 from coverage import create_coverage_resource
 
 
+_PATIENT_RESOURCE_TYPE = Patient.get_resource_type()
+_COVERAGE_RESOURCE_TYPE = Coverage.get_resource_type()
+
+# Sistema de identificación del DNI (RENAPER)
+_DNI_SYSTEM = "http://www.renaper.gob.ar/dni"
+
+# Menús y opciones fijas, armados una sola vez al importar el módulo
+_COVERAGE_TYPES = {
+    "1": ("EHCPOL", "Extended healthcare policy"),
+    "2": ("PUBLICPOL", "Public healthcare policy"),
+    "3": ("DENTPRG", "Dental program")
+}
+_COVERAGE_TYPE_MENU = "\n".join([
+    "\nSeleccione el tipo de cobertura:",
+    "1. Póliza de salud extendida (EHCPOL)",
+    "2. Seguro médico (PUBLICPOL)",
+    "3. Seguro dental (DENTPRG)",
+])
+_COVERAGE_STATUS = {
+    "1": "active",
+    "2": "cancelled",
+    "3": "draft",
+    "4": "entered-in-error"
+}
+_COVERAGE_STATUS_MENU = "\n".join(
+    ["\nSeleccione el estado de la cobertura:"]
+    + [f"{key}. {value}" for key, value in _COVERAGE_STATUS.items()]
+)
+_MAIN_MENU = "\n".join([
+    "\nSeleccione una opción:",
+    "1. Crear o editar paciente",
+    "2. Buscar paciente por DNI",
+    "3. Agregar o editar las coberturas de un paciente",
+    "4. Mostrar coberturas de un paciente",
+    "5. Importar pacientes desde un archivo NDJSON",
+    "6. Salir",
+])
+
+logger = logging.getLogger(__name__)
+
+# Si stdin no es una terminal (entrada redirigida) se lee directamente de sys.stdin,
+# sin el flush de stdout que hace input() en cada pregunta. Se define en main().
+_INTERACTIVE = True
+
+# Pacientes ya resueltos por DNI durante la sesión, para no repetir la búsqueda
+_PATIENTS_BY_DNI_MAXSIZE = 128
+_PATIENTS_BY_DNI: dict[str, tuple[Patient, ...]] = {}
+
+
+def _resolve_patient_by_dni(dni: str) -> tuple[Patient, ...]:
+    """
+    Busca los pacientes con el DNI dado, reutilizando el resultado de búsquedas previas.
+    Solo se recuerdan las búsquedas con resultados, para que un error del servidor o un
+    paciente todavía inexistente no queden registrados como "no encontrado".
+    :param dni: El DNI del paciente.
+    :return: Los pacientes encontrados.
+    """
+    patients = _PATIENTS_BY_DNI.get(dni)
+    if patients is None:
+        patients = tuple(get_resource_by_identifier(dni, _PATIENT_RESOURCE_TYPE))
+        _remember_patients(dni, patients)
+    return patients
+
+
+def _remember_patients(dni: str, patients: tuple[Patient, ...]) -> None:
+    """
+    Guarda el resultado de una búsqueda de pacientes por DNI, si tuvo resultados.
+    :param dni: El DNI buscado.
+    :param patients: Los pacientes encontrados.
+    """
+    if patients:
+        if len(_PATIENTS_BY_DNI) >= _PATIENTS_BY_DNI_MAXSIZE:
+            del _PATIENTS_BY_DNI[next(iter(_PATIENTS_BY_DNI))]
+        _PATIENTS_BY_DNI[dni] = patients
+
+
+def _resolve_patient_with_coverages(dni: str) -> tuple[tuple[Patient, ...], list[Coverage]]:
+    """
+    Busca los pacientes con el DNI dado y las coberturas del primero de ellos con una
+    sola solicitud. Las respuestas quedan en la caché de base hasta que se modifique un
+    paciente o una cobertura.
+    :param dni: El DNI del paciente.
+    :return: Tupla con (pacientes encontrados, coberturas del primer paciente).
+    """
+    found_patients, coverages = get_patient_with_coverages(dni)
+    patients = tuple(found_patients)
+    _remember_patients(dni, patients)
+    if not patients or not patients[0].id:
+        return patients, []
+    # Puede haber coberturas de otros pacientes con el mismo DNI
+    reference = f"{_PATIENT_RESOURCE_TYPE}/{patients[0].id}"
+    return patients, [coverage for coverage in coverages
+                      if coverage.beneficiary and coverage.beneficiary.reference == reference]
+
+
+def _valid_e164(phone: str) -> bool:
+    """
+    Verifica que un número de teléfono tenga formato E.164: un '+' opcional, un primer
+    dígito distinto de cero y entre 1 y 14 dígitos más.
+    :param phone: El número de teléfono a verificar.
+    :return: True si el número es válido, False en caso contrario.
+    """
+    start = 1 if phone.startswith("+") else 0
+    length = len(phone) - start
+    if length < 2 or length > 15:
+        return False
+    if not "1" <= phone[start] <= "9":
+        return False
+    rest = phone[start + 1:]
+    return rest.isascii() and rest.isdigit()
+
+
+def _read_line(prompt: str = "") -> str:
+    """
+    Lee una línea de la entrada estándar, mostrando antes el mensaje dado.
+    :param prompt: Mensaje a mostrar al usuario.
+    :return: La línea leída, sin el salto de línea final.
+    """
+    if _INTERACTIVE:
+        return input(prompt)
+    sys.stdout.write(prompt)
+    line = sys.stdin.readline()
+    if not line:
+        raise EOFError
+    return line.rstrip("\r\n")
+
+
+def _valid_date(date_str: str) -> bool:
+    """
+    Valida que una fecha tenga formato YYYY-MM-DD y sea una fecha existente.
+    :param date_str: La fecha a validar.
+    :return: True si la fecha es válida, False en caso contrario.
+    """
+    if len(date_str) != 10 or date_str[4] != "-" or date_str[7] != "-":
+        return False
+    digits = date_str[:4] + date_str[5:7] + date_str[8:]
+    if not (digits.isascii() and digits.isdigit()):
+        return False
+    year, month, day = int(date_str[:4]), int(date_str[5:7]), int(date_str[8:])
+    if not (1 <= month <= 12 and 1 <= day <= 31):
+        return False
+    # Solo llegan aquí fechas bien formadas; datetime descarta casos como el 30 de febrero
+    try:
+        datetime(year, month, day)
+    except ValueError:
+        return False
+    return True
+
+
 def input_dni() -> str:
     """
     Solicita al usuario que ingrese un DNI y lo devuelve.
     :return: El DNI ingresado por el usuario.
     """
     while True:
-        dni_input = input("Ingrese el DNI del paciente: ")
-        if 7 <= len(dni_input) <= 8 and dni_input.isdigit():
+        dni_input = _read_line("Ingrese el DNI del paciente: ")
+        if 7 <= len(dni_input) <= 8 and dni_input.isascii() and dni_input.isdigit():
             return dni_input
         else:
             print("DNI inválido. Debe tener 7 u 8 dígitos.")
@@ -40,14 +200,12 @@ def input_date(msg: str) -> str | None:
     :return: La fecha de nacimiento ingresada o None si no se proporciona.
     """
     while True:
-        date_input = input(msg + " (YYYY-MM-DD) o presione Enter para omitir: ").strip()
+        date_input = _read_line(msg + " (YYYY-MM-DD) o presione Enter para omitir: ").strip()
         if not date_input:
             return None
-        try:
-            datetime.strptime(date_input, "%Y-%m-%d")
+        if _valid_date(date_input):
             return date_input
-        except ValueError:
-            print("Fecha inválida. Debe estar en formato YYYY-MM-DD.")
+        print("Fecha inválida. Debe estar en formato YYYY-MM-DD.")
 
 
 def input_gender() -> str | None:
@@ -56,7 +214,7 @@ def input_gender() -> str | None:
     :return: El género ingresado o None si no se proporciona.
     """
     while True:
-        gender_input = input("Ingrese el género del paciente (M/F) o" \
+        gender_input = _read_line("Ingrese el género del paciente (M/F) o" \
         " presione Enter para omitir: ").strip().upper()
         if gender_input in ["M", "F", ""]:
             # Convert to FHIR AdministrativeGender codes
@@ -74,7 +232,7 @@ def input_policy_identifier() -> str | None:
     Solicita al usuario que ingrese un número de póliza.
     :return: El número de póliza ingresado o None si no se proporciona.
     """
-    policy_input = input("Ingrese el número de póliza (opcional): ").strip()
+    policy_input = _read_line("Ingrese el número de póliza (opcional): ").strip()
     return policy_input if policy_input else None
 
 
@@ -83,21 +241,13 @@ def input_coverage_type() -> tuple[str, str]:
     Solicita al usuario que seleccione el tipo de cobertura.
     :return: Tupla con (código del tipo, descripción del tipo).
     """
-    coverage_types = {
-        "1": ("EHCPOL", "Extended healthcare policy"),
-        "2": ("PUBLICPOL", "Public healthcare policy"),
-        "3": ("DENTPRG", "Dental program")
-    }
-    print("\nSeleccione el tipo de cobertura:")
-    print("1. Póliza de salud extendida (EHCPOL)")
-    print("2. Seguro médico (PUBLICPOL)")
-    print("3. Seguro dental (DENTPRG)")
+    print(_COVERAGE_TYPE_MENU)
     while True:
-        choice = input("Ingrese su opción (1-3): ").strip()
-        if choice in coverage_types:
-            return coverage_types[choice]
-        else:
-            print("Opción inválida. Debe ser 1, 2 o 3.")
+        choice = _read_line("Ingrese su opción (1-3): ").strip()
+        coverage_type = _COVERAGE_TYPES.get(choice)
+        if coverage_type is not None:
+            return coverage_type
+        print("Opción inválida. Debe ser 1, 2 o 3.")
 
 
 def input_phone() -> str | None:
@@ -105,9 +255,8 @@ def input_phone() -> str | None:
     Solicita al usuario que ingrese un número de teléfono.
     :return: El número de teléfono ingresado o None si no se proporciona.
     """
-    phone_input = input("Ingrese el número de teléfono del paciente (opcional): ").strip()
-    expression = r"^\+?[1-9]\d{1,14}$"
-    if not phone_input or re.match(expression, phone_input):
+    phone_input = _read_line("Ingrese el número de teléfono del paciente (opcional): ").strip()
+    if not phone_input or _valid_e164(phone_input):
         return phone_input if phone_input else None
     else:
         print("Número de teléfono inválido. Debe ser un número válido (u omitir).")
@@ -119,7 +268,7 @@ def input_subscriber_id() -> str | None:
     Solicita al usuario que ingrese el ID del suscriptor.
     :return: El ID del suscriptor ingresado o None si no se proporciona.
     """
-    subscriber_input = input("Ingrese el ID del suscriptor (opcional): ").strip()
+    subscriber_input = _read_line("Ingrese el ID del suscriptor (opcional): ").strip()
     return subscriber_input if subscriber_input else None
 
 
@@ -130,12 +279,47 @@ def input_non_void(msg: str) -> str:
     :return: La string ingresada por el usuario.
     """
     while True:
-        value = input(msg).strip()
+        value = _read_line(msg).strip()
         if value:
             return value
         else:
             print("El valor no puede estar vacío. Inténtelo de nuevo.")
 
+
+def _print_saved_resource(saved_resource: dict,
+                          resource_id: str | None,
+                          resource_type: str) -> None:
+    """
+    Muestra un recurso recién guardado. Solo lo lee del servidor si la respuesta de la
+    escritura no incluía el recurso completo.
+    :param saved_resource: El cuerpo devuelto por el servidor al guardar el recurso.
+    :param resource_id: El ID del recurso guardado.
+    :param resource_type: El tipo de recurso (ejemplo: 'Patient').
+    """
+    if "resourceType" in saved_resource or not resource_id:
+        _print_resource(saved_resource)
+    else:
+        _print_resource(get_resource_from_hapi_fhir(resource_id, resource_type))
+
+
+def _print_resource(resource: dict) -> None:
+    """
+    Muestra los campos de un recurso FHIR, uno por línea.
+    :param resource: El recurso como diccionario.
+    """
+    for key, value in resource.items():
+        print(f"{key}: {value}")
+
+
+def _print_model(resource: Patient | Coverage) -> None:
+    """
+    Muestra los campos de un recurso FHIR, uno por línea. model_dump() ya omite los
+    campos sin valor.
+    :param resource: El recurso a mostrar.
+    """
+    _print_resource(resource.model_dump())
+
+
 # Punto A
 def create_or_edit_patient() -> None:
     """
@@ -144,16 +328,19 @@ def create_or_edit_patient() -> None:
     """
     patient_dni = input_dni()
     # Verificar si el paciente ya existe
-    existing_resources = get_resource_by_identifier(patient_dni, Patient.get_resource_type())
+    existing_resources = _resolve_patient_by_dni(patient_dni)
+    # ID del paciente a editar, o None si se crea uno nuevo
+    target_id: str | None = None
     if existing_resources:
         print(f"Ya existe un paciente con DNI {patient_dni}.")
-        input_choice = input("¿Desea editar el paciente existente? (s/n): ").strip().lower()
+        input_choice = _read_line("¿Desea editar el paciente existente? (s/n): ").strip().lower()
         if input_choice != 's':
             print("Operación cancelada.")
             return
-    if existing_resources[0].id is None:
-        print(f"El paciente con DNI {patient_dni} no tiene un ID válido. No se puede editar.")
-        return
+        target_id = existing_resources[0].id
+        if not target_id:
+            print(f"El paciente con DNI {patient_dni} no tiene un ID válido. No se puede editar.")
+            return
     # Ingresamos los datos del paciente
     family_name = input_non_void("Ingrese el apellido del paciente: ")
     given_name = input_non_void("Ingrese el nombre del paciente: ")
@@ -168,33 +355,53 @@ def create_or_edit_patient() -> None:
         gender=gender,
         phone=phone
     )
-    dni_identifier = Identifier()
-    dni_identifier.system = "http://www.renaper.gob.ar/dni"
-    dni_identifier.value = patient_dni
+    dni_identifier = Identifier(system=_DNI_SYSTEM, value=patient_dni)
     patient_resource.identifier = [dni_identifier]
+    patient_resource.id = target_id
+    # Si se agrega una cobertura, paciente y cobertura se guardan en una sola transacción
+    coverage_choice = _read_line("¿Desea agregar una cobertura al paciente? (s/n): ").strip().lower()
+    if coverage_choice == 's':
+        if target_id:
+            patient_full_url = None
+            coverage_resource = input_coverage(f"{_PATIENT_RESOURCE_TYPE}/{target_id}")
+        else:
+            # El servidor reemplaza la URL temporal por el ID asignado al paciente
+            patient_full_url = f"urn:uuid:{uuid.uuid4()}"
+            coverage_resource = input_coverage(patient_full_url)
+        print(f"Guardando el paciente con DNI {patient_dni} y su cobertura...")
+        saved_ids = send_bundle_to_hapi_fhir([
+            transaction_entry(patient_resource, patient_full_url),
+            transaction_entry(coverage_resource),
+        ])
+        if not saved_ids:
+            print("Error al guardar el paciente y la cobertura")
+        else:
+            _PATIENTS_BY_DNI.pop(patient_dni, None)
+            print("Paciente y cobertura guardados exitosamente")
+            print(f"ID del paciente: {saved_ids[0]}")
+            print(f"ID de la cobertura: {saved_ids[1]}")
+        return
     # Si el paciente ya existe, editamos el recurso
-    if existing_resources:
-        patient_resource.id = existing_resources[0].id
+    if target_id:
         print(f"Editando el paciente con DNI {patient_dni}...")
-        if not edit_resource_in_hapi_fhir(patient_resource):
+        saved_resource = edit_resource_in_hapi_fhir(patient_resource)
+        if saved_resource is None:
             print("Error al editar el paciente")
         else:
+            _PATIENTS_BY_DNI.pop(patient_dni, None)
             print("Paciente editado exitosamente")
             print("Detalles del paciente:")
-            resource = get_resource_from_hapi_fhir(patient_resource.id, Patient.get_resource_type())
-            for key, value in resource.items():
-                print(f"{key}: {value}")
+            _print_saved_resource(saved_resource, target_id, _PATIENT_RESOURCE_TYPE)
     else:
         # Enviamos el recurso de paciente al servidor HAPI FHIR
-        created_id = send_resource_to_hapi_fhir(patient_resource)
-        if not created_id:
+        created_resource = send_resource_to_hapi_fhir(patient_resource)
+        if created_resource is None:
             print("Error al crear el paciente")
         else:
+            _PATIENTS_BY_DNI.pop(patient_dni, None)
             print("Paciente creado exitosamente")
             print("Detalles del paciente:")
-            resource = get_resource_from_hapi_fhir(created_id, Patient.get_resource_type())
-            for key, value in resource.items():
-                print(f"{key}: {value}")
+            _print_saved_resource(created_resource, created_resource.get('id'), _PATIENT_RESOURCE_TYPE)
 
 
 def input_coverage_status() -> str:
@@ -202,21 +409,40 @@ def input_coverage_status() -> str:
     Solicita al usuario que ingrese el estado de la cobertura.
     :return: El estado de la cobertura ingresado por el usuario.
     """
-    options = {
-        "1": "active",
-        "2": "cancelled",
-        "3": "draft",
-        "4": "entered-in-error"
-    }
-    print("\nSeleccione el estado de la cobertura:")
-    for key, value in options.items():
-        print(f"{key}. {value}")
+    print(_COVERAGE_STATUS_MENU)
     while True:
-        choice = input("Ingrese su opción (1-4): ").strip()
-        if choice in options:
-            return options[choice]
-        else:
-            print("Opción inválida. Debe ser 1, 2, 3 o 4.")
+        choice = _read_line("Ingrese su opción (1-4): ").strip()
+        coverage_status = _COVERAGE_STATUS.get(choice)
+        if coverage_status is not None:
+            return coverage_status
+        print("Opción inválida. Debe ser 1, 2, 3 o 4.")
+
+
+def input_coverage(patient_reference: str) -> Coverage:
+    """
+    Solicita al usuario los datos de una cobertura y crea el recurso Coverage.
+    :param patient_reference: La referencia al paciente beneficiario (ejemplo:
+        'Patient/123', o 'urn:uuid:...' dentro de una transacción).
+    :return: El recurso Coverage creado (sin enviar al servidor).
+    """
+    coverage_type, coverage_type_display = input_coverage_type()
+    coverage_status = input_coverage_status()
+    policy_identifier = input_policy_identifier()
+    subscriber_id = input_subscriber_id()
+    start_date = input_date("Ingrese la fecha de inicio de la cobertura")
+    end_date = input_date("Ingrese la fecha de fin de la cobertura")
+    # Crear el recurso de cobertura referenciando al paciente
+    return create_coverage_resource(
+        beneficiary_reference=patient_reference,
+        coverage_type=coverage_type,
+        status=coverage_status,
+        kind="insurance",
+        policy_identifier=policy_identifier,
+        coverage_type_display=coverage_type_display,
+        subscriber_id=subscriber_id,
+        start_date=start_date,
+        end_date=end_date,
+    )
 
 
 # Punto B
@@ -226,7 +452,7 @@ def search_patient_by_dni() -> None:
     :param dni: El DNI del paciente a buscar.
     """
     search_dni = input_dni()
-    resources = get_resource_by_identifier(search_dni, Patient.get_resource_type())
+    resources = _resolve_patient_by_dni(search_dni)
     if not resources:
         print(f"No se encontró el paciente con DNI {search_dni}.")
     elif len(resources) > 1:
@@ -234,8 +460,7 @@ def search_patient_by_dni() -> None:
     else:
         print(f"Paciente encontrado con DNI {search_dni}:")
     for resource in resources:
-        for field_name, field_value in resource.model_dump().items():
-            print(f"{field_name}: {field_value}")
+        _print_model(resource)
 
 
 # Punto C
@@ -244,7 +469,8 @@ def add_or_edit_patient_coverages() -> None:
     Agrega cobertura a un paciente existente.
     """
     patient_dni = input_dni()
-    patient_resources = get_resource_by_identifier(patient_dni, Patient.get_resource_type())
+    # Buscamos el paciente y sus coberturas existentes
+    patient_resources, coverage_resources = _resolve_patient_with_coverages(patient_dni)
     if not patient_resources:
         print(f"No se encontró el paciente con DNI {patient_dni}.")
         return
@@ -253,28 +479,21 @@ def add_or_edit_patient_coverages() -> None:
     if not patient_id:
         print(f"Error: El paciente con DNI {patient_dni} no tiene un ID válido.")
         return
-    # Primero buscamos si hay una cobertura existente para este paciente
-    coverage_resources = get_coverage_by_beneficiary(
-        beneficiary_resource_type=Patient.get_resource_type(),
-        beneficiary_resource_id=patient_id
-    )
     edited_coverage_id: str | None = None
     if coverage_resources:
         print(f"El paciente con DNI {patient_dni} ya tiene cobertura(s) existente(s):")
         for coverage in coverage_resources:
-            for key, value in coverage.model_dump().items():
-                print(f"{key}: {value}")
+            _print_model(coverage)
         options = {
             str(i + 1): coverage.id for i, coverage in enumerate(coverage_resources)
         }
-        for key, value in options.items():
-            print(f"{key}. ID de cobertura: {value}")
+        print("\n".join(f"{key}. ID de cobertura: {value}" for key, value in options.items()))
         print("Seleccione una cobertura para editar o presione Enter para agregar una nueva:")
         done = False
         while not done:
-            choice = input(f"Ingrese su opción (1-{len(options)}): ").strip()
-            if choice in options:
-                edited_coverage_id = options[choice]
+            choice = _read_line(f"Ingrese su opción (1-{len(options)}): ").strip()
+            edited_coverage_id = options.get(choice)
+            if edited_coverage_id is not None:
                 print(f"Editando la cobertura con ID {edited_coverage_id}...")
                 done = True
             elif choice == "":
@@ -284,56 +503,34 @@ def add_or_edit_patient_coverages() -> None:
                 print(f"Opción inválida. Debe ser un número entre 1 y {len(options)} o presione Enter.")
     if edited_coverage_id:
         # Editar o eliminar la cobertura existente
-        delete_choice = input("¿Desea eliminar la cobertura existente? (s/n): ").strip().lower()
+        delete_choice = _read_line("¿Desea eliminar la cobertura existente? (s/n): ").strip().lower()
         if delete_choice == 's':
-            if delete_resource_from_hapi_fhir(edited_coverage_id, Coverage.get_resource_type()):
+            if delete_resource_from_hapi_fhir(edited_coverage_id, _COVERAGE_RESOURCE_TYPE):
                 print("Cobertura eliminada exitosamente.")
             else:
                 print("Error al eliminar la cobertura.")
             return
-    coverage_type, coverage_type_display = input_coverage_type()
-    coverage_status = input_coverage_status()
-    policy_identifier = input_policy_identifier()
-    subscriber_id = input_subscriber_id()
-    start_date = input_date("Ingrese la fecha de inicio de la cobertura")
-    end_date = input_date("Ingrese la fecha de fin de la cobertura")
-    # Crear el recurso de cobertura referenciando al paciente
-    coverage_resource = create_coverage_resource(
-        beneficiary_resource_type=Patient.get_resource_type(),
-        beneficiary_resource_id=patient_id,
-        coverage_type=coverage_type,
-        status=coverage_status,
-        kind="insurance",
-        policy_identifier=policy_identifier,
-        coverage_type_display=coverage_type_display,
-        subscriber_id=subscriber_id,
-        start_date=start_date,
-        end_date=end_date,
-    )
+    coverage_resource = input_coverage(f"{_PATIENT_RESOURCE_TYPE}/{patient_id}")
     if edited_coverage_id:
         # Si se está editando una cobertura existente, asignamos el ID
         coverage_resource.id = edited_coverage_id
         print(f"Editando la cobertura con ID {edited_coverage_id}...")
-        if not edit_resource_in_hapi_fhir(coverage_resource):
+        saved_resource = edit_resource_in_hapi_fhir(coverage_resource)
+        if saved_resource is None:
             print("Error al editar la cobertura")
         else:
             print("Cobertura editada exitosamente")
             print("Detalles de la cobertura:")
-            resource = get_resource_from_hapi_fhir(coverage_resource.id, Coverage.get_resource_type())
-            for key, value in resource.items():
-                print(f"{key}: {value}")
+            _print_saved_resource(saved_resource, coverage_resource.id, _COVERAGE_RESOURCE_TYPE)
     else:
         # Enviamos el recurso de cobertura al servidor HAPI FHIR
-        created_id = send_resource_to_hapi_fhir(coverage_resource)
-        # Leemos el recurso de cobertura del servidor HAPI FHIR
-        if not created_id:
+        created_resource = send_resource_to_hapi_fhir(coverage_resource)
+        if created_resource is None:
             print("Error al crear la cobertura")
         else:
             print("Cobertura creada exitosamente")
             print("Detalles de la cobertura:")
-            resource = get_resource_from_hapi_fhir(created_id, Coverage.get_resource_type())
-            for key, value in resource.items():
-                print(f"{key}: {value}")
+            _print_saved_resource(created_resource, created_resource.get('id'), _COVERAGE_RESOURCE_TYPE)
 
 
 def show_patient_coverages() -> None:
@@ -342,7 +539,7 @@ def show_patient_coverages() -> None:
     :param patient_id: El ID del paciente.
     """
     patient_dni = input_dni()
-    patient_resources = get_resource_by_identifier(patient_dni, Patient.get_resource_type())
+    patient_resources, coverage_resources = _resolve_patient_with_coverages(patient_dni)
     if not patient_resources:
         print(f"No se encontró el paciente con DNI {patient_dni}.")
         return
@@ -351,45 +548,156 @@ def show_patient_coverages() -> None:
     if not patient_id:
         print(f"Error: El paciente con DNI {patient_dni} no tiene un ID válido.")
         return
-    coverage_resources = get_coverage_by_beneficiary(
-        beneficiary_resource_type=Patient.get_resource_type(),
-        beneficiary_resource_id=patient_id
-    )
     if not coverage_resources:
         print(f"No se encontraron coberturas para el paciente con DNI {patient_dni}.")
     else:
         print(f"Coberturas encontradas para el paciente con DNI {patient_dni}:")
         for coverage in coverage_resources:
-            for key, value in coverage.model_dump().items():
-                print(f"{key}: {value}")
+            _print_model(coverage)
 
 
-def main():
+def _import_one(record: dict) -> list[str | None]:
+    """
+    Guarda un paciente, y su cobertura si el registro la incluye, en una sola transacción.
+    La creación del paciente es condicional: si ya existe uno con el mismo DNI, el servidor
+    lo reutiliza en lugar de duplicarlo.
+    :param record: Diccionario con 'dni', los datos del paciente ('family_name', 'given_name',
+        'birth_date', 'gender', 'phone') y opcionalmente 'coverage' con los argumentos de
+        create_coverage_resource, sin los del beneficiario.
+    :return: Los IDs asignados a cada recurso, o una lista vacía si hubo un error.
+    """
+    dni = str(record["dni"])
+    if not (7 <= len(dni) <= 8 and dni.isascii() and dni.isdigit()):
+        raise ValueError(f"DNI inválido: {dni}")
+    patient_resource = create_patient_resource(
+        family_name=record.get("family_name"),
+        given_name=record.get("given_name"),
+        birth_date=record.get("birth_date"),
+        gender=record.get("gender"),
+        phone=record.get("phone")
+    )
+    patient_resource.identifier = [Identifier(system=_DNI_SYSTEM, value=dni)]
+    # El servidor reemplaza la URL temporal por el ID del paciente creado o existente
+    patient_full_url = f"urn:uuid:{uuid.uuid4()}"
+    patient_entry = transaction_entry(patient_resource, patient_full_url)
+    patient_entry.request.ifNoneExist = f"identifier={_DNI_SYSTEM}|{dni}"
+    entries = [patient_entry]
+    if record.get("coverage"):
+        coverage_resource = create_coverage_resource(
+            beneficiary_reference=patient_full_url,
+            **record["coverage"]
+        )
+        entries.append(transaction_entry(coverage_resource))
+    saved_ids = send_bundle_to_hapi_fhir(entries)
+    _PATIENTS_BY_DNI.pop(dni, None)
+    return saved_ids
+
+
+def _import_line(line: str) -> list[str | None]:
+    """
+    Decodifica una línea JSON e importa el registro (ver _import_one).
+    :param line: La línea con el registro.
+    :return: Los IDs asignados a cada recurso, o una lista vacía si hubo un error.
+    """
+    return _import_one(orjson.loads(line))
+
+
+def import_records(lines) -> tuple[int, int]:
+    """
+    Importa pacientes desde líneas JSON (un registro por línea, ver _import_one).
+    Los registros se envían en paralelo desde varios hilos, que comparten el pool de
+    conexiones de la sesión HTTP. Las líneas vacías se ignoran.
+    :param lines: Iterable de líneas, por ejemplo un archivo abierto o sys.stdin.
+    :return: Tupla con (registros importados, registros con error).
+    """
+    imported = failed = 0
+    with ThreadPoolExecutor(max_workers=BULK_CONCURRENCY) as executor:
+        futures = {
+            executor.submit(_import_line, line): line_number
+            for line_number, line in enumerate(lines, start=1) if line.strip()
+        }
+        for future in as_completed(futures):
+            try:
+                saved_ids = future.result()
+            except (KeyError, TypeError, ValueError) as e:
+                logger.warning("Registro inválido en la línea %d: %s", futures[future], e)
+                saved_ids = []
+            except requests.RequestException as e:
+                logger.warning("Error de conexión al importar la línea %d: %s", futures[future], e)
+                saved_ids = []
+            if saved_ids:
+                imported += 1
+            else:
+                failed += 1
+    return imported, failed
+
+
+def bulk_import(path: str) -> tuple[int, int]:
+    """
+    Importa pacientes desde un archivo NDJSON (un registro JSON por línea).
+    :param path: Ruta del archivo.
+    :return: Tupla con (registros importados, registros con error).
+    """
+    with open(path, encoding="utf-8") as f:
+        return import_records(f)
+
+
+def bulk_import_from_file() -> None:
+    """
+    Solicita la ruta de un archivo NDJSON e importa sus pacientes.
+    """
+    path = input_non_void("Ingrese la ruta del archivo NDJSON: ")
+    try:
+        f = open(path, encoding="utf-8")
+    except OSError as e:
+        print(f"No se pudo leer el archivo: {e}")
+        return
+    with f:
+        imported, failed = import_records(f)
+    print(f"Registros importados: {imported}. Registros con error: {failed}.")
+
+
+def main(argv: list[str] | None = None):
     """
     Función principal que gestiona el flujo de trabajo de creación y obtención de recursos FHIR.
+    :param argv: Argumentos de línea de comandos (por defecto, los de sys.argv).
     """
+    global _INTERACTIVE
+    parser = argparse.ArgumentParser(description="Gestión de pacientes FHIR")
+    parser.add_argument("--bulk", action="store_true",
+                        help="importar pacientes desde stdin, un registro JSON por línea")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s: %(message)s")
+    _INTERACTIVE = sys.stdin.isatty()
+    if args.bulk:
+        imported, failed = import_records(sys.stdin)
+        print(f"Registros importados: {imported}. Registros con error: {failed}.")
+        close_session()
+        return
     print("Bienvenido al sistema de gestión de pacientes FHIR")
-    while True:
-        print("\nSeleccione una opción:")
-        print("1. Crear o editar paciente")
-        print("2. Buscar paciente por DNI")
-        print("3. Agregar o editar las coberturas de un paciente")
-        print("4. Mostrar coberturas de un paciente")
-        print("5. Salir")
-        choice = input("Ingrese su opción (1-5): ").strip()
-        if choice == "1":
-            create_or_edit_patient()
-        elif choice == "2":
-            search_patient_by_dni()
-        elif choice == "3":
-            add_or_edit_patient_coverages()
-        elif choice == "4":
-            show_patient_coverages()
-        elif choice == "5":
-            print("Saliendo del sistema...")
-            break
-        else:
-            print("Opción inválida. Inténtelo de nuevo.")
+    try:
+        while True:
+            print(_MAIN_MENU)
+            choice = _read_line("Ingrese su opción (1-6): ").strip()
+            if choice == "1":
+                create_or_edit_patient()
+            elif choice == "2":
+                search_patient_by_dni()
+            elif choice == "3":
+                add_or_edit_patient_coverages()
+            elif choice == "4":
+                show_patient_coverages()
+            elif choice == "5":
+                bulk_import_from_file()
+            elif choice == "6":
+                break
+            else:
+                print("Opción inválida. Inténtelo de nuevo.")
+    except EOFError:
+        # Se terminó la entrada (por ejemplo, un archivo redirigido a stdin)
+        print()
+    print("Saliendo del sistema...")
+    close_session()
 
 
 if __name__ == "__main__":